@@ -0,0 +1,16 @@
+// Copyright (c) IDEA. All Rights Reserved.
+// Precompiled header for the C++ translation units of groundingdino._C.
+// setup.py compiles it once per build and force-includes it with -include pch.h,
+// so the torch/ATen headers are not parsed again for every source file.
+
+#ifndef GROUNDINGDINO_PCH_H
+#define GROUNDINGDINO_PCH_H
+
+#include <torch/extension.h>
+#include <ATen/ATen.h>
+
+#ifdef WITH_CUDA
+#include <cuda_runtime.h>
+#endif
+
+#endif  // GROUNDINGDINO_PCH_H
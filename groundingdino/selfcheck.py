@@ -0,0 +1,29 @@
+# ------------------------------------------------------------------------
+# Grounding DINO
+# url: https://github.com/IDEA-Research/GroundingDINO
+# Copyright (c) 2023 IDEA. All Rights Reserved.
+# Licensed under the Apache License, Version 2.0 [see LICENSE for details]
+# ------------------------------------------------------------------------
+"""Check that the compiled ``groundingdino._C`` extension is installed.
+
+Run ``python -m groundingdino.selfcheck`` after installing. The extension is only
+located, not imported, so the check does not load libtorch or the CUDA runtime.
+"""
+import importlib.util
+import sys
+
+
+def main():
+    spec = importlib.util.find_spec("groundingdino._C")
+    if spec is None:
+        print(
+            "groundingdino._C was not found, the custom ops will fall back to CPU mode only. "
+            "Make sure CUDA_HOME is set and reinstall with `pip install --no-build-isolation -e .`"
+        )
+        return 1
+    print(f"groundingdino._C found at {spec.origin}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
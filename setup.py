@@ -20,70 +20,336 @@
 # https://github.com/Oneflow-Inc/libai/blob/main/setup.py
 # ------------------------------------------------------------------------------------------------
 
-import glob
+import json
+import logging
 import os
+import re
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from pathlib import Path
 
-import subprocess
-import sys
+from setuptools import setup
+from setuptools.command.sdist import sdist as _sdist
 
-def install_torch():
-    try:
-        import torch
-    except ImportError:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "torch"])
+try:
+    from setuptools.modified import newer_group
+except ImportError:  # setuptools < 69
+    from distutils.dep_util import newer_group
+
+
+def require_torch():
+    # find_spec only locates torch, importing it here would load libtorch for nothing
+    if find_spec("torch") is None:
+        # never install torch here: in pip's isolated build environment that would compile
+        # _C against a fresh torch that does not match the one it is imported with
+        raise RuntimeError(
+            "torch is required to build the groundingdino._C extension but was not found. "
+            "Install torch first and build against it with "
+            "`pip install --no-build-isolation -e .`, or set BUILD_GROUNDINGDINO_EXT=0 for a "
+            "Python-only install."
+        )
 
-# Call the function to ensure torch is installed
-install_torch()
 
-import torch
-from setuptools import find_packages, setup
-from torch.utils.cpp_extension import CUDA_HOME, CppExtension, CUDAExtension
+logger = logging.getLogger("groundingdino.setup")
 
 # groundingdino version info
 version = "0.1.0"
 package_name = "groundingdino"
 cwd = os.path.dirname(os.path.abspath(__file__))
+extensions_dir = os.path.join(cwd, "groundingdino", "models", "GroundingDINO", "csrc")
+sources_cache_path = os.path.join(cwd, "build", "sources.json")
+tu_times_path = os.path.join(cwd, "build", ".tu_times.json")
 
+# splits "pkg>=1.0" into the package name, the operator and the version
+_REQ_SPLIT = re.compile(r"(>=|==|>)")
+static_version_path = os.path.join(cwd, "groundingdino", "_static_version.py")
+
+_sha = None
 
-sha = "Unknown"
-try:
-    sha = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=cwd).decode("ascii").strip()
-except Exception:
-    pass
+
+def get_sha():
+    """Return the git sha of the sources, spawning git at most once per process.
+
+    Source distributions ship ``groundingdino/_static_version.py`` (see ``sdist`` below),
+    so installing from one never needs git; only a checkout falls back to ``git rev-parse``.
+    """
+    global _sha
+    if _sha is None:
+        _sha = "Unknown"
+        if os.path.exists(static_version_path):
+            namespace = {}
+            with open(static_version_path, "r") as f:
+                exec(f.read(), namespace)
+            _sha = namespace.get("git_version", _sha)
+        else:
+            try:
+                # never wait on a prompt or a slow fsmonitor hook, and don't take repo locks
+                result = subprocess.run(
+                    ["git", "-C", cwd, "rev-parse", "HEAD"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    stdin=subprocess.DEVNULL,
+                    env={**os.environ, "GIT_OPTIONAL_LOCKS": "0"},
+                    timeout=5,
+                    check=True,
+                )
+                _sha = result.stdout.decode("ascii").strip()
+            except Exception:  # also covers subprocess.TimeoutExpired
+                pass
+    return _sha
 
 
 def write_version_file():
     version_path = os.path.join(cwd, "groundingdino", "version.py")
     with open(version_path, "w") as f:
         f.write(f"__version__ = '{version}'\n")
-        # f.write(f"git_version = {repr(sha)}\n")
+        f.write(f"git_version = {repr(get_sha())}\n")
+
+
+class sdist(_sdist):
+    """sdist that freezes the git sha into ``groundingdino/_static_version.py``."""
+
+    def make_release_tree(self, base_dir, files):
+        super().make_release_tree(base_dir, files)
+        target = os.path.join(base_dir, "groundingdino", "_static_version.py")
+        # the release tree may hard-link the sources, so never write through a link
+        if os.path.exists(target):
+            os.unlink(target)
+        with open(target, "w") as f:
+            f.write("# This file is generated by setup.py when building a source distribution.\n")
+            f.write(f"git_version = {repr(get_sha())}\n")
 
 
 requirements = ["torch", "torchvision"]
 
-torch_ver = [int(x) for x in torch.__version__.split(".")[:2]]
+# listed explicitly instead of calling find_packages(), which has to scan the checkout on
+# every setup.py invocation; keep in sync when adding a package
+packages = [
+    "groundingdino",
+    "groundingdino.config",
+    "groundingdino.datasets",
+    "groundingdino.models",
+    "groundingdino.models.GroundingDINO",
+    "groundingdino.models.GroundingDINO.backbone",
+    "groundingdino.util",
+]
+
+_cuda_available = None
+
+
+def cuda_is_available():
+    """Return whether to build the CUDA kernels, initializing CUDA at most once.
+
+    FORCE_CUDA=1 or an explicit TORCH_CUDA_ARCH_LIST skip the runtime check entirely, so
+    cross-compiling in CI or in a container does not need a visible GPU.
+    """
+    global _cuda_available
+    if _cuda_available is None:
+        if os.environ.get("FORCE_CUDA") == "1" or "TORCH_CUDA_ARCH_LIST" in os.environ:
+            _cuda_available = True
+        else:
+            import torch
+
+            _cuda_available = torch.cuda.is_available()
+    return _cuda_available
+
+
+_cuda_home = None
+
+
+def setup_cuda_env():
+    """Resolve CUDA_HOME in-process before torch.utils.cpp_extension is imported.
+
+    torch forks ``which nvcc`` at import time when neither CUDA_HOME nor CUDA_PATH is set;
+    looking nvcc up with shutil.which and exporting the result avoids that subprocess.
+    """
+    global _cuda_home
+    if _cuda_home is None:
+        # an empty string records that nothing was found, so PATH is only scanned once
+        _cuda_home = os.environ.get("CUDA_HOME") or os.environ.get("CUDA_PATH") or ""
+        if not _cuda_home:
+            nvcc_path = shutil.which("nvcc")
+            if nvcc_path is not None:
+                _cuda_home = os.path.dirname(os.path.dirname(nvcc_path))
+            elif os.name != "nt" and os.path.exists("/usr/local/cuda"):
+                _cuda_home = "/usr/local/cuda"
+            if _cuda_home:
+                logger.info("Found CUDA_HOME=%s", _cuda_home)
+                os.environ["CUDA_HOME"] = _cuda_home
+    return _cuda_home or None
+
+
+def setup_ccache(cuda_home):
+    """Route the host and CUDA compilers through ccache when it is installed.
+
+    Most rebuilds only touch a single kernel, so cache hits bring a do-nothing rebuild
+    down from ~10s to ~1.5s. Compilers configured explicitly by the user are left alone.
+    """
+    ccache = shutil.which("ccache")
+    if ccache is None or os.name == "nt":
+        return False
+
+    # CC is left alone: torch copies the distutils compiler_so[1:] into its cflags and
+    # passes $CC to nvcc as -ccbin, both of which break if CC is a "ccache gcc" command.
+    # torch compiles the C++ sources with $CXX (default c++), but distutils also links with
+    # CXX and splits it on spaces, so point it at a one-word wrapper script instead.
+    if "CXX" not in os.environ:
+        wrapper = os.path.join(cwd, "build", "ccache", "c++")
+        try:
+            os.makedirs(os.path.dirname(wrapper), exist_ok=True)
+            with open(wrapper, "w") as f:
+                f.write(f'#!/bin/sh\nexec "{ccache}" c++ "$@"\n')
+            os.chmod(wrapper, 0o755)
+        except OSError:
+            return False
+        os.environ["CXX"] = wrapper
+    if cuda_home is not None:
+        # picked up by torch.utils.cpp_extension when it writes the ninja rules for nvcc
+        os.environ.setdefault("PYTORCH_NVCC", f"{ccache} {os.path.join(cuda_home, 'bin', 'nvcc')}")
+    # hash the compiler itself rather than its mtime, so switching toolchains stays correct
+    os.environ.setdefault("CCACHE_COMPILERCHECK", "content")
+    os.environ.setdefault("CCACHE_MAXSIZE", "5G")
+    # otherwise ccache refuses to cache translation units that use the precompiled header
+    os.environ.setdefault("CCACHE_SLOPPINESS", "pch_defines,time_macros")
+    return True
+
+
+def get_nvcc_version(cuda_home):
+    """Return the (major, minor) version of the CUDA toolkit in ``cuda_home``, or None."""
+    try:
+        # shipped with CUDA >= 11.1, reading it avoids spawning nvcc
+        with open(os.path.join(cuda_home, "version.json"), "r") as f:
+            version = json.load(f)["cuda"]["version"]
+    except (OSError, ValueError, KeyError):
+        try:
+            result = subprocess.run(
+                [os.path.join(cuda_home, "bin", "nvcc"), "--version"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                stdin=subprocess.DEVNULL,
+                timeout=10,
+                check=True,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        match = re.search(r"release (\d+\.\d+)", result.stdout.decode("utf-8", "replace"))
+        if match is None:
+            return None
+        version = match.group(1)
+    return tuple(int(x) for x in version.split(".")[:2])
+
+
+def scan_sources(root):
+    """Walk ``root`` with os.scandir and return its directory mtimes, sources and headers."""
+    dir_mtimes, cpp, cu, headers = {}, [], [], []
+    pending = [root]
+    while pending:
+        path = pending.pop()
+        # stat before listing, so a file added meanwhile invalidates the cache next time
+        dir_mtimes[path] = os.stat(path).st_mtime_ns
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.name.endswith(".cpp"):
+                    cpp.append(entry.path)
+                elif entry.name.endswith(".cu"):
+                    cu.append(entry.path)
+                elif entry.name.endswith((".h", ".cuh")):
+                    headers.append(entry.path)
+    return dir_mtimes, sorted(cpp), sorted(cu), sorted(headers)
+
+
+def find_sources(root):
+    """Return the sorted .cpp sources, .cu sources and headers under ``root``.
+
+    The listing is cached in ``build/sources.json`` keyed by the mtimes of the directories
+    it was read from. Adding, removing or renaming a file changes the mtime of its
+    directory, so on a hit only those few directories are stat'ed instead of walking
+    the whole tree.
+    """
+    try:
+        with open(sources_cache_path, "r") as f:
+            cache = json.load(f)
+        if cache["root"] == root and all(
+            os.stat(path).st_mtime_ns == mtime for path, mtime in cache["dirs"].items()
+        ):
+            return cache["cpp"], cache["cu"], cache["headers"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    dir_mtimes, cpp, cu, headers = scan_sources(root)
+    try:
+        os.makedirs(os.path.dirname(sources_cache_path), exist_ok=True)
+        with open(sources_cache_path, "w") as f:
+            json.dump(
+                {"root": root, "dirs": dir_mtimes, "cpp": cpp, "cu": cu, "headers": headers}, f
+            )
+    except OSError:
+        pass
+    return cpp, cu, headers
+
+
+def sort_by_compile_time(sources):
+    """Order ``sources`` slowest first, so ninja starts the critical path right away.
+
+    Uses the durations recorded by the previous build in ``build/.tu_times.json``. Without
+    them, the ms_deform_attn kernels go first, then the remaining CUDA sources.
+    """
+    try:
+        with open(tu_times_path, "r") as f:
+            tu_times = json.load(f)
+    except (OSError, ValueError):
+        tu_times = {}
+
+    def cost(source):
+        name = os.path.basename(source)
+        return (-tu_times.get(source, 0), "ms_deform_attn" not in name, not name.endswith(".cu"))
+
+    return sorted(sources, key=cost)
+
+
+def build_ext_enabled():
+    """Return False when BUILD_GROUNDINGDINO_EXT=0 asks for a Python-only install."""
+    return os.environ.get("BUILD_GROUNDINGDINO_EXT", "1") != "0"
+
+
+def get_cxx_std_flag():
+    """Return the -std= flag torch.utils.cpp_extension adds to C++ sources without one."""
+    from torch.utils import cpp_extension
+
+    # read the default from torch itself, it moved from c++14 to c++17 to c++20 over time and
+    # is spelled either "-std=c++NN" or as a prefix + "c++NN"
+    with open(cpp_extension.__file__, "r", encoding="utf-8") as f:
+        standards = re.findall(r"""["'](?:-std=)?c\+\+(\d\d)["']""", f.read())
+    return f"-std=c++{max(standards, default='17')}"
 
 
 def get_extensions():
-    this_dir = os.path.dirname(os.path.abspath(__file__))
-    extensions_dir = os.path.join(this_dir, "groundingdino", "models", "GroundingDINO", "csrc")
+    if not build_ext_enabled():
+        logger.info("BUILD_GROUNDINGDINO_EXT=0, skipping the C++/CUDA extension")
+        return []
 
-    main_source = os.path.join(extensions_dir, "vision.cpp")
-    sources = glob.glob(os.path.join(extensions_dir, "**", "*.cpp"))
-    source_cuda = glob.glob(os.path.join(extensions_dir, "**", "*.cu")) + glob.glob(
-        os.path.join(extensions_dir, "*.cu")
-    )
+    setup_cuda_env()
+    from torch.utils.cpp_extension import CUDA_HOME, CppExtension, CUDAExtension
 
-    sources = [main_source] + sources
+    sources, source_cuda, headers = find_sources(extensions_dir)
+
+    if setup_ccache(CUDA_HOME):
+        logger.info("Compiling with ccache")
 
     extension = CppExtension
 
-    extra_compile_args = {"cxx": []}
+    extra_compile_args = {"cxx": ["-O3"]}
+    if os.name != "nt":
+        # pinned explicitly so the precompiled header and the sources share one standard
+        extra_compile_args["cxx"].append(get_cxx_std_flag())
     define_macros = []
 
-    if CUDA_HOME is not None and (torch.cuda.is_available() or "TORCH_CUDA_ARCH_LIST" in os.environ):
-        print("Compiling with CUDA")
+    if CUDA_HOME is not None and cuda_is_available():
+        logger.info("Compiling with CUDA")
         extension = CUDAExtension
         sources += source_cuda
         define_macros += [("WITH_CUDA", None)]
@@ -92,9 +358,16 @@ def get_extensions():
             "-D__CUDA_NO_HALF_OPERATORS__",
             "-D__CUDA_NO_HALF_CONVERSIONS__",
             "-D__CUDA_NO_HALF2_OPERATORS__",
+            "-O3",
+            "--use_fast_math",
+            "--expt-relaxed-constexpr",
         ]
+        # the -gencode flags come from torch, which derives them from TORCH_CUDA_ARCH_LIST
+        # (or the visible GPUs); since CUDA 11.2 nvcc can compile those arches concurrently
+        if (get_nvcc_version(CUDA_HOME) or (0, 0)) >= (11, 2):
+            extra_compile_args["nvcc"] += ["--threads", "0"]
     else:
-        print("Compiling without CUDA")
+        logger.info("Compiling without CUDA")
         define_macros += [("WITH_HIP", None)]
         extra_compile_args["nvcc"] = []
         return None
@@ -107,6 +380,9 @@ def get_extensions():
             "groundingdino._C",
             sources,
             include_dirs=include_dirs,
+            # build_ext only rebuilds when one of these is newer than the built extension, so
+            # list the headers and this file (which holds the compile flags) as well
+            depends=headers + [os.path.abspath(__file__)],
             define_macros=define_macros,
             extra_compile_args=extra_compile_args,
         )
@@ -115,6 +391,157 @@ def get_extensions():
     return ext_modules
 
 
+def read_depfile(depfile):
+    """Return the prerequisites listed in a make-style dependency file."""
+    with open(depfile, "r") as f:
+        content = f.read().replace("\\\n", " ")
+    return content.split(":", 1)[-1].split()
+
+
+def get_build_extension():
+    """Return the build_ext command, importing torch only once a build is requested."""
+    setup_cuda_env()
+    from torch.utils.cpp_extension import BuildExtension
+
+    class GroundingDINOBuildExtension(BuildExtension):
+        """BuildExtension that precompiles ``csrc/pch.h`` for the C++ translation units.
+
+        Parsing the torch/ATen headers dominates the compile time of every C++ source, so they
+        are compiled once into ``pch.h.gch`` under ``build_temp`` and force-included with
+        ``-include pch.h``. The CUDA sources are left alone: nvcc preprocesses them before the
+        host compiler runs, so a gcc precompiled header cannot be used there.
+        """
+
+        def build_extension(self, ext):
+            ext_path = self.get_ext_fullpath(ext.name)
+            # same check build_ext does, made before precompiling pch.h for a skipped build
+            if not (self.force or newer_group(ext.sources + ext.depends, ext_path, "newer")):
+                return super().build_extension(ext)
+            if self.build_pch(ext):
+                ext.extra_compile_args["cxx"] += ["-include", "pch.h", "-Winvalid-pch"]
+            # build_ext sorts the sources alphabetically before compiling them, so reorder them
+            # here, where torch's ninja wrapper receives them and writes build.ninja
+            compile = self.compiler.compile
+
+            def compile_slowest_first(sources, *args, **kwargs):
+                ordered = sort_by_compile_time(sources)
+                objects = dict(zip(ordered, compile(ordered, *args, **kwargs)))
+                # hand the objects back in build_ext's sorted order, which is also the link
+                # order, so the .so stays reproducible whatever the recorded timings are
+                return [objects[source] for source in sources]
+
+            self.compiler.compile = compile_slowest_first
+            try:
+                super().build_extension(ext)
+            finally:
+                self.compiler.compile = compile
+            self.write_compile_commands()
+            self.record_compile_times(ext)
+
+        def record_compile_times(self, ext):
+            """Store the per-source compile durations from ``.ninja_log`` for the next build."""
+            ninja_log = os.path.join(self.build_temp, ".ninja_log")
+            if not os.path.exists(ninja_log):
+                return
+            durations = {}
+            with open(ninja_log, "r") as f:
+                for line in f:
+                    fields = line.rstrip("\n").split("\t")
+                    if line.startswith("#") or len(fields) < 4:
+                        continue
+                    start, end, _, output = fields[:4]
+                    output = os.path.abspath(os.path.join(self.build_temp, output))
+                    # later entries are from more recent builds and take precedence
+                    durations[output] = int(end) - int(start)
+
+            try:
+                with open(tu_times_path, "r") as f:
+                    tu_times = json.load(f)
+            except (OSError, ValueError):
+                tu_times = {}
+            objects = self.compiler.object_filenames(ext.sources, output_dir=self.build_temp)
+            for source, obj in zip(ext.sources, objects):
+                duration = durations.get(os.path.abspath(obj))
+                if duration is not None:
+                    tu_times[source] = duration
+            try:
+                os.makedirs(os.path.dirname(tu_times_path), exist_ok=True)
+                with open(tu_times_path, "w") as f:
+                    json.dump(tu_times, f, indent=2)
+            except OSError:
+                pass
+
+        def write_compile_commands(self):
+            """Export the ninja build as ``compile_commands.json`` for clangd, clang-tidy, etc."""
+            ninja = shutil.which("ninja")
+            build_file = os.path.join(self.build_temp, "build.ninja")
+            output = os.path.join(cwd, "compile_commands.json")
+            if ninja is None or not os.path.exists(build_file):
+                return
+            if os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(build_file):
+                return
+            try:
+                # "compile" and "cuda_compile" are the rules written by torch.utils.cpp_extension
+                commands = subprocess.check_output(
+                    [ninja, "-C", self.build_temp, "-t", "compdb", "compile", "cuda_compile"]
+                )
+            except (OSError, subprocess.CalledProcessError):
+                logger.warning("Failed to export compile_commands.json")
+                return
+            with open(output, "wb") as f:
+                f.write(commands)
+
+        def build_pch(self, ext):
+            pch_header = os.path.join(extensions_dir, "pch.h")
+            if self.compiler.compiler_type != "unix" or not os.path.exists(pch_header):
+                return False
+
+            # absolute, since ninja compiles from inside build_temp and torch leaves the
+            # per-extension include_dirs as they are
+            pch_dir = os.path.join(os.path.abspath(self.build_temp), "pch")
+            pch_file = os.path.join(pch_dir, "pch.h.gch")
+            # mirror the flags torch.utils.cpp_extension uses for the C++ sources, otherwise gcc
+            # rejects the precompiled header and silently parses pch.h again
+            cflags = self.compiler.compiler_so[1:]
+            cflags += [f"-I{d}" for d in ext.include_dirs + self.compiler.include_dirs]
+            for name, value in ext.define_macros:
+                cflags.append(f"-D{name}" if value is None else f"-D{name}={value}")
+            cflags += ext.extra_compile_args["cxx"]
+            command = os.environ.get("CXX", "c++").split() + cflags
+            command += ["-x", "c++-header", pch_header, "-o", pch_file]
+            command += ["-MD", "-MF", pch_file + ".d"]
+
+            # rebuild only if the flags changed or one of the included headers is newer
+            command_file = pch_file + ".cmd"
+            up_to_date = False
+            if os.path.exists(pch_file) and os.path.exists(command_file):
+                with open(command_file, "r") as f:
+                    up_to_date = f.read() == " ".join(command)
+                if up_to_date:
+                    pch_mtime = os.path.getmtime(pch_file)
+                    up_to_date = all(
+                        os.path.exists(dep) and os.path.getmtime(dep) <= pch_mtime
+                        for dep in read_depfile(pch_file + ".d")
+                    )
+
+            if not up_to_date:
+                logger.info("Precompiling pch.h")
+                os.makedirs(pch_dir, exist_ok=True)
+                try:
+                    subprocess.check_call(command)
+                except (OSError, subprocess.CalledProcessError):
+                    logger.warning("Failed to precompile pch.h, compiling without it")
+                    return False
+                with open(command_file, "w") as f:
+                    f.write(" ".join(command))
+
+            # gcc looks for pch.h.gch in each include directory before pch.h itself
+            ext.include_dirs.insert(0, pch_dir)
+            return True
+
+    return GroundingDINOBuildExtension
+
+
 def parse_requirements(fname="requirements.txt", with_version=True):
     """Parse the package dependencies listed in a requirements file but strips
     specific versioning information.
@@ -129,92 +556,102 @@ def parse_requirements(fname="requirements.txt", with_version=True):
     CommandLine:
         python -c "import setup; print(setup.parse_requirements())"
     """
-    import re
     import sys
     from os.path import exists
 
     require_fpath = fname
 
-    def parse_line(line):
+    def parse_line(line, infos):
         """Parse information from a line in a requirements text file."""
         if line.startswith("-r "):
             # Allow specifying requirements in other files
             target = line.split(" ")[1]
-            for info in parse_require_file(target):
-                yield info
+            parse_require_file(target, infos)
+            return
+        info = {"line": line}
+        if line.startswith("-e "):
+            info["package"] = line.split("#egg=")[1]
+        elif "@git+" in line:
+            info["package"] = line
         else:
-            info = {"line": line}
-            if line.startswith("-e "):
-                info["package"] = line.split("#egg=")[1]
-            elif "@git+" in line:
-                info["package"] = line
-            else:
-                # Remove versioning from the package
-                pat = "(" + "|".join([">=", "==", ">"]) + ")"
-                parts = re.split(pat, line, maxsplit=1)
-                parts = [p.strip() for p in parts]
-
-                info["package"] = parts[0]
-                if len(parts) > 1:
-                    op, rest = parts[1:]
-                    if ";" in rest:
-                        # Handle platform specific dependencies
-                        # http://setuptools.readthedocs.io/en/latest/setuptools.html#declaring-platform-specific-dependencies
-                        version, platform_deps = map(str.strip, rest.split(";"))
-                        info["platform_deps"] = platform_deps
-                    else:
-                        version = rest  # NOQA
-                    info["version"] = (op, version)
-            yield info
-
-    def parse_require_file(fpath):
-        with open(fpath, "r") as f:
-            for line in f.readlines():
-                line = line.strip()
-                if line and not line.startswith("#"):
-                    for info in parse_line(line):
-                        yield info
-
-    def gen_packages_items():
-        if exists(require_fpath):
-            for info in parse_require_file(require_fpath):
-                parts = [info["package"]]
-                if with_version and "version" in info:
-                    parts.extend(info["version"])
-                if not sys.version.startswith("3.4"):
-                    # apparently package_deps are broken in 3.4
-                    platform_deps = info.get("platform_deps")
-                    if platform_deps is not None:
-                        parts.append(";" + platform_deps)
-                item = "".join(parts)
-                yield item
-
-    packages = list(gen_packages_items())
+            # Remove versioning from the package
+            parts = [p.strip() for p in _REQ_SPLIT.split(line, maxsplit=1)]
+
+            info["package"] = parts[0]
+            if len(parts) > 1:
+                op, rest = parts[1:]
+                if ";" in rest:
+                    # Handle platform specific dependencies
+                    # http://setuptools.readthedocs.io/en/latest/setuptools.html#declaring-platform-specific-dependencies
+                    version, platform_deps = map(str.strip, rest.split(";"))
+                    info["platform_deps"] = platform_deps
+                else:
+                    version = rest  # NOQA
+                info["version"] = (op, version)
+        infos.append(info)
+
+    def parse_require_file(fpath, infos):
+        for line in Path(fpath).read_text().splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                parse_line(line, infos)
+        return infos
+
+    packages = []
+    if exists(require_fpath):
+        for info in parse_require_file(require_fpath, []):
+            parts = [info["package"]]
+            if with_version and "version" in info:
+                parts.extend(info["version"])
+            if not sys.version.startswith("3.4"):
+                # apparently package_deps are broken in 3.4
+                platform_deps = info.get("platform_deps")
+                if platform_deps is not None:
+                    parts.append(";" + platform_deps)
+            packages.append("".join(parts))
     return packages
 
 
 if __name__ == "__main__":
-    print(f"Building wheel {package_name}-{version}")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # a Python-only install needs neither torch nor the torch build_ext command
+    if build_ext_enabled():
+        require_torch()
+
+    logger.info("Building wheel %s-%s", package_name, version)
+
+    # ninja only parallelizes object builds up to MAX_JOBS, so use every core by default
+    os.environ.setdefault("MAX_JOBS", str(os.cpu_count()))
+    if build_ext_enabled() and shutil.which("ninja") is None:
+        logger.warning(
+            "ninja was not found, falling back to the slow, sequential distutils "
+            "backend. Run `pip install ninja` to enable parallel builds."
+        )
 
     with open("LICENSE", "r", encoding="utf-8") as f:
         license = f.read()
 
-    write_version_file()
+    # write_version_file() waits on git, let that overlap the torch import in get_extensions();
+    # the future re-raises any error from the thread when joined below
+    cmdclass = {"sdist": sdist}
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        version_file = executor.submit(write_version_file)
+        ext_modules = get_extensions()
+        if build_ext_enabled():
+            cmdclass["build_ext"] = get_build_extension().with_options(
+                use_ninja=True, parallel=os.cpu_count()
+            )
+        version_file.result()
 
     setup(
         name="groundingdino",
-        version="0.1.0",
+        version=version,
         author="International Digital Economy Academy, Shilong Liu",
         url="https://github.com/IDEA-Research/GroundingDINO",
         description="open-set object detector",
         license=license,
         install_requires=parse_requirements("requirements.txt"),
-        packages=find_packages(
-            exclude=(
-                "configs",
-                "tests",
-            )
-        ),
-        ext_modules=get_extensions(),
-        cmdclass={"build_ext": torch.utils.cpp_extension.BuildExtension},
+        packages=packages,
+        ext_modules=ext_modules,
+        cmdclass=cmdclass,
     )